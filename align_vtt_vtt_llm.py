@@ -21,6 +21,8 @@ import json
 import os
 import sys
 import glob
+import traceback
+from bisect import bisect_left
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 from collections import Counter
@@ -43,6 +45,33 @@ except ImportError:
     DOTENV_AVAILABLE = False
 
 
+# Zoom recording file prefix: GMT<YYYYMMDD>-<HHMMSS>
+GMT_FILENAME_RE = re.compile(r'GMT(\d{8})-(\d{6})')
+
+# Standard VTT: cues are runs of lines separated by blank lines
+VTT_BLOCK_RE = re.compile(r'[^\n]+(?:\n[^\n]+)*')
+VTT_TIMESTAMP_RE = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})')
+
+# Text VTT cue with a numbered speaker tag: "[SPEAKER_X] text"
+SPEAKER_TAG_RE = re.compile(r'^\[SPEAKER_\d+\]\s*(.*)$')
+
+# TurboScribe header: [Speaker X] (MM:SS - MM:SS) or (H:MM:SS - H:MM:SS)
+TURBOSCRIBE_HEADER_RE = re.compile(
+    r'\[Speaker\s+(\d+)\]\s*\((\d{1,2}):(\d{2}):?(\d{2})?\s*-\s*(\d{1,2}):(\d{2}):?(\d{2})?\)'
+)
+TURBOSCRIBE_DETECT_RE = re.compile(r'\[Speaker\s+\d+\]\s*\(\d{1,2}:\d{2}')
+
+# Service note TurboScribe inserts into long transcripts
+TURBOSCRIBE_MARKER_RE = re.compile(r'\(This file is longer than.*?\)', re.DOTALL)
+
+# Sentence boundary used to split TurboScribe blocks; the separator is captured
+SENTENCE_SPLIT_RE = re.compile(r'([.!?]\s+)')
+
+# Input files looked up by find_vtt_files, in priority order
+SPEAKER_VTT_SUFFIXES = ('.transcript.vtt', '-transcript.vtt')  # zoom: real names, bad text
+TEXT_FILE_SUFFIXES = ('.mp4.vtt', '-mp4.vtt', ' Recording.txt')  # TurboScribe: good text
+
+
 @dataclass
 class VTTSegment:
     start: float
@@ -72,32 +101,41 @@ def parse_timestamp(ts: str) -> float:
     return 0.0
 
 
+def iter_vtt_blocks(content: str):
+    """
+    Yield stripped cue blocks of a VTT file (skipping the WEBVTT header).
+    Blocks are produced lazily instead of splitting the whole file into a list.
+    """
+    for match in VTT_BLOCK_RE.finditer(content):
+        block = match.group().strip()
+        if block and block != 'WEBVTT':
+            yield block
+
+
 def parse_vtt_with_speakers(filepath: str) -> List[VTTSegment]:
     """Parse zoom.vtt - ONLY use for timestamps and speaker names, NOT text."""
     with open(filepath, 'r', encoding='utf-8') as f:
         content = f.read()
     
     segments = []
-    blocks = re.split(r'\n\n+', content)
-    
-    for block in blocks:
-        if not block.strip() or block.strip() == 'WEBVTT':
-            continue
-        
-        lines = block.strip().split('\n')
+    for block in iter_vtt_blocks(content):
+        lines = block.split('\n')
         timestamp_line = None
         text_lines = []
         
         for line in lines:
             if '-->' in line:
                 timestamp_line = line
-            elif line.strip() and not line.strip().isdigit():
-                text_lines.append(line.strip())
+                continue
+            # Strip once and reuse for the cue-number check and the text
+            stripped = line.strip()
+            if stripped and not stripped.isdigit():
+                text_lines.append(stripped)
         
         if not timestamp_line or not text_lines:
             continue
         
-        match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})', timestamp_line)
+        match = VTT_TIMESTAMP_RE.search(timestamp_line)
         if not match:
             continue
         
@@ -105,11 +143,12 @@ def parse_vtt_with_speakers(filepath: str) -> List[VTTSegment]:
         end = parse_timestamp(match.group(2))
         
         # Extract speaker name ONLY (text from zoom.vtt is unreliable!)
+        # "Name: text" - plain partition on the first colon, no regex needed
         first_line = text_lines[0]
-        speaker_match = re.match(r'^([^:]+):\s*(.*)$', first_line)
+        name, colon, _ = first_line.partition(':')
         
-        if speaker_match:
-            speaker = speaker_match.group(1).strip()
+        if colon and name:
+            speaker = name.strip()
         else:
             speaker = "Unknown"
         
@@ -128,12 +167,15 @@ def parse_turboscribe_format(filepath: str) -> List[VTTSegment]:
     with open(filepath, 'r', encoding='utf-8') as f:
         content = f.read()
     
+    return parse_turboscribe_content(content)
+
+
+def parse_turboscribe_content(content: str) -> List[VTTSegment]:
+    """Parse already loaded TurboScribe text (see parse_turboscribe_format)."""
     segments = []
     
-    # Regex to match: [Speaker X] (time - time)
-    pattern = r'\[Speaker\s+(\d+)\]\s*\((\d{1,2}):(\d{2}):?(\d{2})?\s*-\s*(\d{1,2}):(\d{2}):?(\d{2})?\)'
-    
-    matches = list(re.finditer(pattern, content))
+    # Match: [Speaker X] (time - time)
+    matches = list(TURBOSCRIBE_HEADER_RE.finditer(content))
     
     for i, match in enumerate(matches):
         speaker_num = match.group(1)
@@ -159,9 +201,10 @@ def parse_turboscribe_format(filepath: str) -> List[VTTSegment]:
             text_end = len(content)
         
         text = content[text_start:text_end].strip()
-        # Remove special markers
-        text = re.sub(r'\(This file is longer than.*?\)', '', text, flags=re.DOTALL)
-        text = text.strip()
+        # Remove special markers (search in place first - the marker is rare)
+        if TURBOSCRIBE_MARKER_RE.search(content, text_start, text_end):
+            text = TURBOSCRIBE_MARKER_RE.sub('', text)
+            text = text.strip()
         
         if text:
             segments.append(VTTSegment(start=start, end=end, speaker="", text=text))
@@ -169,13 +212,21 @@ def parse_turboscribe_format(filepath: str) -> List[VTTSegment]:
     return segments
 
 
-def detect_vtt_format(filepath: str) -> str:
-    """Detect VTT format type."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read(1000)  # Read first 1000 chars
+def detect_vtt_format(filepath: str, content: Optional[str] = None) -> str:
+    """
+    Detect VTT format type.
+    
+    Only the first 1000 chars are inspected. Pass already loaded file
+    content to avoid opening the file a second time.
+    """
+    if content is None:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read(1000)  # Read first 1000 chars
+    else:
+        content = content[:1000]
     
     # Check for TurboScribe format - [Speaker X] (MM:SS - MM:SS) pattern
-    if '[Speaker' in content and re.search(r'\[Speaker\s+\d+\]\s*\(\d{1,2}:\d{2}', content):
+    if '[Speaker' in content and TURBOSCRIBE_DETECT_RE.search(content):
         return 'turboscribe'
     
     # Standard VTT format has "WEBVTT" and "-->" timestamps
@@ -193,37 +244,36 @@ def detect_vtt_format(filepath: str) -> str:
 def parse_vtt_without_speakers(filepath: str) -> List[VTTSegment]:
     """Parse turboscribe.vtt - high quality text, no speakers OR numbered speakers."""
     
+    # Read once - format detection and parsing share the content
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
     # Detect format
-    fmt = detect_vtt_format(filepath)
+    fmt = detect_vtt_format(filepath, content)
     
     if fmt == 'turboscribe':
-        return parse_turboscribe_format(filepath)
+        return parse_turboscribe_content(content)
     
     # Standard VTT format
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
     segments = []
-    blocks = re.split(r'\n\n+', content)
-    
-    for block in blocks:
-        if not block.strip() or block.strip() == 'WEBVTT':
-            continue
-        
-        lines = block.strip().split('\n')
+    for block in iter_vtt_blocks(content):
+        lines = block.split('\n')
         timestamp_line = None
         text_lines = []
         
         for line in lines:
             if '-->' in line:
                 timestamp_line = line
-            elif line.strip() and not line.strip().isdigit():
-                text_lines.append(line.strip())
+                continue
+            # Strip once and reuse for the cue-number check and the text
+            stripped = line.strip()
+            if stripped and not stripped.isdigit():
+                text_lines.append(stripped)
         
         if not timestamp_line or not text_lines:
             continue
         
-        match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})', timestamp_line)
+        match = VTT_TIMESTAMP_RE.search(timestamp_line)
         if not match:
             continue
         
@@ -234,7 +284,10 @@ def parse_vtt_without_speakers(filepath: str) -> List[VTTSegment]:
         full_text = ' '.join(text_lines).strip()
         
         # Check if text has [SPEAKER_X] format and extract it
-        speaker_tag_match = re.match(r'^\[SPEAKER_\d+\]\s*(.*)$', full_text)
+        # (cheap prefix check first - most cues have no tag at all)
+        speaker_tag_match = None
+        if full_text.startswith('[SPEAKER_'):
+            speaker_tag_match = SPEAKER_TAG_RE.match(full_text)
         if speaker_tag_match:
             # Keep the speaker tag, extract text after it
             text = speaker_tag_match.group(1).strip()
@@ -253,22 +306,54 @@ def calculate_overlap(seg1_start: float, seg1_end: float, seg2_start: float, seg
     return max(0, overlap_end - overlap_start)
 
 
+class SpeakerIndex:
+    """
+    Time index over speaker segments for fast overlap lookups.
+    
+    Segments are sorted by start once; window() uses binary search to return
+    only the segments that can overlap a time range, instead of scanning
+    the whole list for every text segment.
+    """
+    
+    def __init__(self, segments: List[VTTSegment]):
+        self.segments = segments
+        self._order = sorted(range(len(segments)), key=lambda i: segments[i].start)
+        self._starts = [segments[i].start for i in self._order]
+        # Longest segment bounds how far back an overlapping start can be
+        self._max_duration = max((max(0.0, s.end - s.start) for s in segments), default=0.0)
+    
+    def window(self, start: float, end: float, tolerance: float = 0.0) -> List[VTTSegment]:
+        """
+        Return segments that may overlap [start - tolerance, end + tolerance],
+        in their original order.
+        """
+        lo = bisect_left(self._starts, start - tolerance - self._max_duration)
+        hi = bisect_left(self._starts, end + tolerance)
+        return [self.segments[i] for i in sorted(self._order[lo:hi])]
+
+
 def find_speaker_candidates(
     text_seg: VTTSegment,
     speaker_segs: List[VTTSegment],
-    tolerance: float = 0.0
+    tolerance: float = 0.0,
+    index: Optional[SpeakerIndex] = None
 ) -> List[Dict]:
     """
     Find all possible speaker candidates for a text segment.
     
     Args:
         tolerance: Time tolerance in seconds (expands speaker windows)
+        index: Optional SpeakerIndex over speaker_segs (limits the scan
+               to segments near text_seg)
     
     Returns list of candidates with overlap info, sorted by overlap duration.
     """
     candidates = []
     text_duration = text_seg.end - text_seg.start
     
+    if index is not None:
+        speaker_segs = index.window(text_seg.start, text_seg.end, tolerance)
+    
     for spk_seg in speaker_segs:
         # Calculate strict overlap
         strict_overlap = calculate_overlap(
@@ -349,18 +434,26 @@ def find_speaker_candidates(
 def smart_fallback(
     text_seg: VTTSegment,
     speaker_vtt: List[VTTSegment],
-    context_before: List[AlignedSegment]
+    context_before: List[AlignedSegment],
+    index: Optional[SpeakerIndex] = None
 ) -> Dict:
     """
     Intelligent fallback using conversation context.
     
+    Args:
+        index: Optional SpeakerIndex over speaker_vtt (limits the nearby
+            speaker scan to the time window)
+    
     Returns:
         Dict with speaker, confidence, and reasoning
     """
     # Find speakers within 10sec window
     time_window = 10.0
+    nearby_pool = speaker_vtt
+    if index is not None:
+        nearby_pool = index.window(text_seg.start, text_seg.start, time_window)
     nearby_speakers = [
-        s for s in speaker_vtt
+        s for s in nearby_pool
         if abs(s.start - text_seg.start) < time_window
     ]
     
@@ -425,6 +518,27 @@ def smart_fallback(
     }
 
 
+# Static parts of the speaker prompt - built once, only the context varies per call
+LLM_SYSTEM_PROMPT = "Ты эксперт по анализу транскриптов встреч. Отвечай только в JSON формате."
+
+LLM_PROMPT_HEADER = "Ты эксперт по анализу транскриптов встреч. Определи, кто говорит данный фрагмент.\n\n"
+
+LLM_PROMPT_RULES = """
+
+ВАЖНО:
+- Используй ТОЛЬКО кандидатов из списка выше
+- НЕ выдумывай новых спикеров
+- Учитывай контекст разговора и логику беседы
+- Если несколько человек перебивают друг друга, выбери того, кто говорит ОСНОВНУЮ часть фрагмента
+
+Ответь в формате JSON:
+{
+    "speaker": "Имя спикера",
+    "confidence": 0.95,
+    "reasoning": "Краткое объяснение выбора"
+}"""
+
+
 def ask_llm_for_speaker(
     text_seg: VTTSegment,
     candidates: List[Dict],
@@ -456,66 +570,57 @@ def ask_llm_for_speaker(
             'reasoning': 'LLM not available, using top time-overlap candidate'
         }
     
-    # Build context
-    context_text = "Предыдущие фрагменты:\n"
+    # Build context (collect fragments, join once)
+    context_parts = ["Предыдущие фрагменты:\n"]
     for seg in context_before[-3:]:  # Last 3
-        context_text += f"- **{seg.speaker}**: {seg.text[:100]}...\n"
+        context_parts.append(f"- **{seg.speaker}**: {seg.text[:100]}...\n")
     
-    context_text += f"\n**ТЕКУЩИЙ ФРАГМЕНТ** [{format_time(text_seg.start)} - {format_time(text_seg.end)}]:\n"
-    context_text += f'"{text_seg.text}"\n\n'
+    context_parts.append(f"\n**ТЕКУЩИЙ ФРАГМЕНТ** [{format_time(text_seg.start)} - {format_time(text_seg.end)}]:\n")
+    context_parts.append(f'"{text_seg.text}"\n\n')
     
     # Check if candidates have real time overlap
     has_overlap = any(c.get('overlap_ratio', 0) > 0 for c in candidates)
     
     if has_overlap:
-        context_text += "Кандидаты (по времени overlap):\n"
+        context_parts.append("Кандидаты (по времени overlap):\n")
         for i, c in enumerate(candidates[:5], 1):  # Top 5
-            context_text += f"{i}. {c['speaker']}: {c['overlap_ratio']:.1%} времени\n"
+            context_parts.append(f"{i}. {c['speaker']}: {c['overlap_ratio']:.1%} времени\n")
     else:
-        context_text += "Кандидаты (нет прямого временного пересечения, выбраны по контексту):\n"
+        context_parts.append("Кандидаты (нет прямого временного пересечения, выбраны по контексту):\n")
         for i, c in enumerate(candidates[:5], 1):  # Top 5
-            context_text += f"{i}. {c['speaker']}: недавно активен в диалоге\n"
+            context_parts.append(f"{i}. {c['speaker']}: недавно активен в диалоге\n")
     
     if context_after:
-        context_text += "\nСледующие фрагменты:\n"
+        context_parts.append("\nСледующие фрагменты:\n")
         for seg in context_after[:2]:  # Next 2
-            context_text += f"- {seg.text[:100]}...\n"
+            context_parts.append(f"- {seg.text[:100]}...\n")
     
-    prompt = f"""Ты эксперт по анализу транскриптов встреч. Определи, кто говорит данный фрагмент.
-
-{context_text}
-
-ВАЖНО:
-- Используй ТОЛЬКО кандидатов из списка выше
-- НЕ выдумывай новых спикеров
-- Учитывай контекст разговора и логику беседы
-- Если несколько человек перебивают друг друга, выбери того, кто говорит ОСНОВНУЮ часть фрагмента
-
-Ответь в формате JSON:
-{{
-    "speaker": "Имя спикера",
-    "confidence": 0.95,
-    "reasoning": "Краткое объяснение выбора"
-}}"""
+    context_text = ''.join(context_parts)
+    
+    prompt = LLM_PROMPT_HEADER + context_text + LLM_PROMPT_RULES
 
     if verbose:
-        print(f"\n{'='*80}")
-        print(f"[LLM] CALLING LLM for segment at {format_time(text_seg.start)}")
-        print(f"{'='*80}")
-        print(f"Text: {text_seg.text[:150]}...")
-        print(f"\nCandidates:")
+        # Assemble the whole trace block and print it with a single write
+        trace = [
+            f"\n{'='*80}",
+            f"[LLM] CALLING LLM for segment at {format_time(text_seg.start)}",
+            f"{'='*80}",
+            f"Text: {text_seg.text[:150]}...",
+            f"\nCandidates:",
+        ]
         for i, c in enumerate(candidates[:5], 1):
-            print(f"  {i}. {c['speaker']}: {c['overlap_ratio']:.1%}")
-        print(f"\n--- PROMPT START ---")
-        print(prompt)
-        print(f"--- PROMPT END ---\n")
+            trace.append(f"  {i}. {c['speaker']}: {c['overlap_ratio']:.1%}")
+        trace.append(f"\n--- PROMPT START ---")
+        trace.append(prompt)
+        trace.append(f"--- PROMPT END ---\n")
+        print('\n'.join(trace))
 
 
     try:
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "Ты эксперт по анализу транскриптов встреч. Отвечай только в JSON формате."},
+                {"role": "system", "content": LLM_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
@@ -529,12 +634,14 @@ def ask_llm_for_speaker(
         result = json.loads(response.choices[0].message.content)
         
         if verbose:
-            print(f"--- LLM RESPONSE START ---")
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-            print(f"--- LLM RESPONSE END ---")
-            print(f"[LLM] Decision: {result['speaker']} (confidence: {result.get('confidence', 0):.2f})")
-            print(f"[LLM] Reasoning: {result.get('reasoning', 'N/A')}")
-            print(f"{'='*80}\n")
+            print('\n'.join([
+                f"--- LLM RESPONSE START ---",
+                json.dumps(result, ensure_ascii=False, indent=2),
+                f"--- LLM RESPONSE END ---",
+                f"[LLM] Decision: {result['speaker']} (confidence: {result.get('confidence', 0):.2f})",
+                f"[LLM] Reasoning: {result.get('reasoning', 'N/A')}",
+                f"{'='*80}\n",
+            ]))
         
         # Validate speaker is in candidates
         valid_speakers = [c['speaker'] for c in candidates]
@@ -553,7 +660,7 @@ def ask_llm_for_speaker(
     except Exception as e:
         print(f"[!] LLM error: {e}")
         if verbose:
-            import traceback
+            # Full traceback only on request - formatting it reads source files per frame
             traceback.print_exc()
         return {
             'speaker': candidates[0]['speaker'],
@@ -575,29 +682,27 @@ def extract_date_from_gmt_filename(directory: str) -> Optional[str]:
     Extract date from GMT filename in directory.
     GMT20251002-132900 -> 2025-10-02 13:29
     """
-    import os
-    import re
-    from pathlib import Path
-    
     dir_path = Path(directory)
     
     # Search for GMT*.vtt or GMT*.mp4 files
-    for filename in os.listdir(dir_path):
-        match = re.match(r'GMT(\d{8})-(\d{6})', filename)
-        if match:
-            date_part = match.group(1)  # 20251002
-            time_part = match.group(2)  # 132900
-            
-            # Parse date: YYYYMMDD
-            year = date_part[0:4]
-            month = date_part[4:6]
-            day = date_part[6:8]
-            
-            # Parse time: HHMMSS
-            hour = time_part[0:2]
-            minute = time_part[2:4]
-            
-            return f"{year}-{month}-{day} {hour}:{minute}"
+    # (scandir streams entries, so we stop reading the directory at the first match)
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            match = GMT_FILENAME_RE.match(entry.name)
+            if match:
+                date_part = match.group(1)  # 20251002
+                time_part = match.group(2)  # 132900
+                
+                # Parse date: YYYYMMDD
+                year = date_part[0:4]
+                month = date_part[4:6]
+                day = date_part[6:8]
+                
+                # Parse time: HHMMSS
+                hour = time_part[0:2]
+                minute = time_part[2:4]
+                
+                return f"{year}-{month}-{day} {hour}:{minute}"
     
     # Fallback to current date if no GMT file found
     return datetime.now().strftime('%Y-%m-%d %H:%M')
@@ -605,21 +710,29 @@ def extract_date_from_gmt_filename(directory: str) -> Optional[str]:
 
 def split_turboscribe_segment_by_speakers(
     text_seg: VTTSegment,
-    speaker_segs: List[VTTSegment]
+    speaker_segs: List[VTTSegment],
+    index: Optional[SpeakerIndex] = None
 ) -> List[VTTSegment]:
     """
     Split a TurboScribe text segment into multiple segments based on speaker changes.
     TurboScribe gives large blocks, but transcript.vtt has detailed speaker timings.
+    
+    If index is given, only speaker segments in the text segment's time
+    window are scanned instead of the whole list.
     """
-    # Find all speaker segments that overlap with this text segment
+    # Find all speaker segments that overlap with this text segment.
+    # Hot loop: same test as calculate_overlap(...) > 0, but inlined to
+    # avoid a function call and max/min per speaker segment.
     overlapping = []
-    for spk_seg in speaker_segs:
-        overlap = calculate_overlap(
-            spk_seg.start, spk_seg.end,
-            text_seg.start, text_seg.end
-        )
-        if overlap > 0:
-            overlapping.append(spk_seg)
+    if text_seg.end > text_seg.start:
+        text_start, text_end = text_seg.start, text_seg.end
+        if index is not None:
+            speaker_segs = index.window(text_start, text_end)
+        overlapping = [
+            spk_seg for spk_seg in speaker_segs
+            if spk_seg.start < text_end and spk_seg.end > text_start
+            and spk_seg.end > spk_seg.start
+        ]
     
     if not overlapping:
         return [text_seg]
@@ -634,19 +747,20 @@ def split_turboscribe_segment_by_speakers(
     
     # Split text by sentences
     text = text_seg.text
-    sentences = re.split(r'([.!?]\s+)', text)
-    
-    # Reconstruct sentences with punctuation
-    full_sentences = []
-    i = 0
-    while i < len(sentences):
-        if i + 1 < len(sentences) and re.match(r'^[.!?]\s+$', sentences[i + 1]):
-            full_sentences.append(sentences[i] + sentences[i + 1].strip())
-            i += 2
-        else:
-            if sentences[i].strip():
-                full_sentences.append(sentences[i])
-            i += 1
+    # Cheap precheck: without sentence punctuation there is nothing to split
+    if '.' not in text and '!' not in text and '?' not in text:
+        return [text_seg]
+    sentences = SENTENCE_SPLIT_RE.split(text)
+    
+    # Reconstruct sentences with punctuation.
+    # re.split with a capturing group alternates text/separator, so every
+    # odd index is already a separator - no need to re-match it.
+    full_sentences = [
+        sentences[i] + sentences[i + 1].strip()
+        for i in range(0, len(sentences) - 1, 2)
+    ]
+    if sentences[-1].strip():
+        full_sentences.append(sentences[-1])
     
     if len(full_sentences) <= 1:
         return [text_seg]
@@ -699,9 +813,7 @@ def build_speaker_mapping(speaker_vtt: List[VTTSegment]) -> Dict[str, str]:
     # Get unique speaker names and their total speaking time
     speaker_time = {}
     for seg in sorted_speakers:
-        if seg.speaker not in speaker_time:
-            speaker_time[seg.speaker] = 0
-        speaker_time[seg.speaker] += (seg.end - seg.start)
+        speaker_time[seg.speaker] = speaker_time.get(seg.speaker, 0) + (seg.end - seg.start)
     
     # Sort by speaking time (most active speakers first)
     sorted_by_time = sorted(speaker_time.items(), key=lambda x: x[1], reverse=True)
@@ -735,6 +847,7 @@ def align_with_llm(
     
     # Build speaker mapping
     speaker_mapping = build_speaker_mapping(speaker_vtt)
+    speaker_index = SpeakerIndex(speaker_vtt)
     
     aligned = []
     stats = {
@@ -752,7 +865,7 @@ def align_with_llm(
     # Split text segments if they span multiple speakers
     expanded_text_vtt = []
     for text_seg in text_vtt:
-        split_segments = split_turboscribe_segment_by_speakers(text_seg, speaker_vtt)
+        split_segments = split_turboscribe_segment_by_speakers(text_seg, speaker_vtt, index=speaker_index)
         expanded_text_vtt.extend(split_segments)
     
     print(f"   [+] Расширено до {len(expanded_text_vtt)} сегментов после разделения по спикерам")
@@ -778,22 +891,25 @@ def align_with_llm(
             continue
         
         # Find all candidates (strict first)
-        candidates = find_speaker_candidates(text_seg, speaker_vtt, tolerance=0.0)
+        candidates = find_speaker_candidates(text_seg, speaker_vtt, tolerance=0.0, index=speaker_index)
         
         # If no candidates with strict overlap, try with tolerance
         used_tolerance = False
         if not candidates:
-            candidates = find_speaker_candidates(text_seg, speaker_vtt, tolerance=3.0)
+            candidates = find_speaker_candidates(text_seg, speaker_vtt, tolerance=3.0, index=speaker_index)
             used_tolerance = True
         
         if not candidates:
             # No overlap even with tolerance
-            fallback_result = smart_fallback(text_seg, speaker_vtt, aligned[-10:] if aligned else [])
+            fallback_result = smart_fallback(
+                text_seg, speaker_vtt, aligned[-10:] if aligned else [], index=speaker_index
+            )
             
             # If we have API key and good context, try LLM even for fallback
             if client and len(aligned) >= 5 and fallback_result['confidence'] < 0.6:
                 # Build pseudo-candidates from recent speakers
-                recent_speakers = list(set(s.speaker for s in aligned[-10:]))[:5]
+                # (most recent first; dict.fromkeys dedups while keeping that order, unlike set)
+                recent_speakers = list(dict.fromkeys(s.speaker for s in reversed(aligned[-10:])))[:5]
                 if recent_speakers:
                     pseudo_candidates = [
                         {
@@ -940,17 +1056,20 @@ def find_vtt_files(folder_path: str) -> Tuple[Optional[str], Optional[str]]:
         print(f"[X] Папка не найдена: {folder_path}")
         return None, None
     
-    # Find .transcript.vtt file (speaker names, bad text)
-    # Support both "*.transcript.vtt" and "*-transcript.vtt" patterns
-    transcript_files = list(folder.glob("*.transcript.vtt")) + list(folder.glob("*-transcript.vtt"))
+    # List the folder once and bucket files by suffix, instead of one glob
+    # pass per pattern. Suffix order is the lookup priority.
+    by_suffix = {suffix: [] for suffix in SPEAKER_VTT_SUFFIXES + TEXT_FILE_SUFFIXES}
+    for name in (os.listdir(folder) if folder.is_dir() else []):
+        for suffix in by_suffix:
+            if name.endswith(suffix):
+                by_suffix[suffix].append(folder / name)
+                break
     
-    # Find good text file (numbered speakers, good text)
-    # Support: *.mp4.vtt, *-mp4.vtt, OR "* Recording.txt"
-    mp4_vtt_files = (
-        list(folder.glob("*.mp4.vtt")) + 
-        list(folder.glob("*-mp4.vtt")) +
-        list(folder.glob("* Recording.txt"))
-    )
+    # .transcript.vtt file (speaker names, bad text)
+    transcript_files = [f for suffix in SPEAKER_VTT_SUFFIXES for f in by_suffix[suffix]]
+    
+    # Good text file (numbered speakers, good text)
+    mp4_vtt_files = [f for suffix in TEXT_FILE_SUFFIXES for f in by_suffix[suffix]]
     
     if not transcript_files:
         print(f"[X] Не найден файл *.transcript.vtt в папке: {folder_path}")
@@ -972,6 +1091,25 @@ def find_vtt_files(folder_path: str) -> Tuple[Optional[str], Optional[str]]:
     return speaker_vtt, text_vtt
 
 
+def write_text_atomic(output_path: str, text: str):
+    """
+    Write text to output_path atomically.
+    
+    Writes to a temp file next to the target and swaps it in with os.replace,
+    so an interrupted run never leaves a truncated output file behind.
+    """
+    tmp_path = output_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        # BaseException so Ctrl-C (KeyboardInterrupt) also cleans up the temp file
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def generate_markdown(segments: List[AlignedSegment], output_path: str, folder_path: str = None):
     """Generate transcript markdown with grouped phrases."""
     lines = []
@@ -987,13 +1125,15 @@ def generate_markdown(segments: List[AlignedSegment], output_path: str, folder_p
     lines.append(f"**Дата:** {meeting_date}")
     
     if segments:
+        # Used both in the header and in the statistics section below
         total_duration = segments[-1].end - segments[0].start
+        avg_conf = sum(s.confidence for s in segments) / len(segments)
+        
         lines.append(f"**Длительность:** {format_time(total_duration)}")
         
         speakers = set(seg.speaker for seg in segments)
         lines.append(f"**Участники:** {len(speakers)}")
         
-        avg_conf = sum(s.confidence for s in segments) / len(segments)
         lines.append(f"**Точность:** {avg_conf:.1%}")
     
     lines.append("")
@@ -1025,22 +1165,13 @@ def generate_markdown(segments: List[AlignedSegment], output_path: str, folder_p
     
     # Output grouped segments
     for group in grouped:
-        # Склеить все тексты одного спикера в одну строку
-        texts = []
-        for text in group['texts']:
-            text = text.strip()
-            if text:
-                texts.append(text)
+        # Склеить все тексты одного спикера в одну строку и нормализовать
+        # пробелы за один проход (split() сам отбрасывает пустые куски)
+        combined_text = ' '.join(' '.join(group['texts']).split())
         
-        if not texts:
+        if not combined_text:
             continue
         
-        # Соединяем все тексты через пробел в одну строку
-        combined_text = ' '.join(texts)
-        
-        # Нормализуем пробелы и знаки препинания
-        combined_text = ' '.join(combined_text.split())  # Убираем лишние пробелы
-        
         start_time = format_time(group['start'])
         end_time = format_time(group['end'])
         
@@ -1048,56 +1179,63 @@ def generate_markdown(segments: List[AlignedSegment], output_path: str, folder_p
         lines.append(f"**{group['speaker']}** [{start_time} - {end_time}]: {combined_text}")
         lines.append("")  # Пустая строка между спикерами
     
-    # Statistics
-    lines.append("---")
-    lines.append("")
-    lines.append("## Статистика")
-    lines.append("")
-    
-    speaker_counts = Counter(seg.speaker for seg in segments)
-    lines.append("### Участники")
-    lines.append("")
-    
-    total_duration = segments[-1].end - segments[0].start
-    for speaker, count in speaker_counts.most_common():
-        speaker_segs = [s for s in segments if s.speaker == speaker]
-        speaker_duration = sum(s.end - s.start for s in speaker_segs)
-        speaker_conf = sum(s.confidence for s in speaker_segs) / len(speaker_segs)
+    # Statistics (same guard as the header: totals and ratios need segments)
+    if segments:
+        lines.append("---")
+        lines.append("")
+        lines.append("## Статистика")
+        lines.append("")
         
-        lines.append(f"- **{speaker}**: {count} сегментов, {format_time(speaker_duration)} ({speaker_duration/total_duration*100:.1f}%), точность {speaker_conf:.1%}")
-    
-    lines.append("")
-    lines.append("### Качество выравнивания")
-    lines.append("")
-    
-    match_types = Counter(seg.match_type for seg in segments)
-    lines.append(f"- Высокая уверенность (time-based): {match_types['high_confidence']} ({match_types['high_confidence']/len(segments)*100:.1f}%)")
-    lines.append(f"- Разрешено через LLM: {match_types['llm_resolved']} ({match_types['llm_resolved']/len(segments)*100:.1f}%)")
-    lines.append(f"- Fallback: {match_types.get('fallback', 0)} ({match_types.get('fallback', 0)/len(segments)*100:.1f}%)")
-    
-    avg_conf = sum(s.confidence for s in segments) / len(segments)
-    lines.append(f"- Средняя уверенность: {avg_conf:.1%}")
-    
-    low_conf = [s for s in segments if s.confidence < 0.7]
-    if low_conf:
-        lines.append(f"- [!] Низкая уверенность (<70%): {len(low_conf)} сегментов ({len(low_conf)/len(segments)*100:.1f}%)")
+        speaker_counts = Counter(seg.speaker for seg in segments)
+        lines.append("### Участники")
+        lines.append("")
+        
+        # Per-speaker duration/confidence totals in one pass over segments
+        speaker_durations = {}
+        speaker_conf_sums = {}
+        for seg in segments:
+            speaker_durations[seg.speaker] = speaker_durations.get(seg.speaker, 0) + (seg.end - seg.start)
+            speaker_conf_sums[seg.speaker] = speaker_conf_sums.get(seg.speaker, 0) + seg.confidence
+        
+        for speaker, count in speaker_counts.most_common():
+            speaker_duration = speaker_durations[speaker]
+            speaker_conf = speaker_conf_sums[speaker] / count
+            
+            lines.append(f"- **{speaker}**: {count} сегментов, {format_time(speaker_duration)} ({speaker_duration/total_duration*100:.1f}%), точность {speaker_conf:.1%}")
+        
+        lines.append("")
+        lines.append("### Качество выравнивания")
+        lines.append("")
+        
+        match_types = Counter(seg.match_type for seg in segments)
+        lines.append(f"- Высокая уверенность (time-based): {match_types['high_confidence']} ({match_types['high_confidence']/len(segments)*100:.1f}%)")
+        lines.append(f"- Разрешено через LLM: {match_types['llm_resolved']} ({match_types['llm_resolved']/len(segments)*100:.1f}%)")
+        lines.append(f"- Fallback: {match_types.get('fallback', 0)} ({match_types.get('fallback', 0)/len(segments)*100:.1f}%)")
+        
+        lines.append(f"- Средняя уверенность: {avg_conf:.1%}")
+        
+        low_conf = [s for s in segments if s.confidence < 0.7]
+        if low_conf:
+            lines.append(f"- [!] Низкая уверенность (<70%): {len(low_conf)} сегментов ({len(low_conf)/len(segments)*100:.1f}%)")
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines))
+    write_text_atomic(output_path, '\n'.join(lines))
 
 
 def generate_jsonl(segments: List[AlignedSegment], output_path: str):
     """Generate clean JSONL for production use."""
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for seg in segments:
-            data = {
-                'start': round(seg.start, 2),
-                'end': round(seg.end, 2),
-                'speaker': seg.speaker,
-                'text': seg.text,
-                'confidence': round(seg.confidence, 2)
-            }
-            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+    # Build all records first, then write them in one call
+    records = []
+    for seg in segments:
+        data = {
+            'start': round(seg.start, 2),
+            'end': round(seg.end, 2),
+            'speaker': seg.speaker,
+            'text': seg.text,
+            'confidence': round(seg.confidence, 2)
+        }
+        records.append(json.dumps(data, ensure_ascii=False) + '\n')
+    
+    write_text_atomic(output_path, ''.join(records))
 
 
 def generate_vtt(segments: List[AlignedSegment], output_path: str):
@@ -1123,8 +1261,7 @@ def generate_vtt(segments: List[AlignedSegment], output_path: str):
         lines.append(f"{seg.speaker}: {seg.text}")
         lines.append("")
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines))
+    write_text_atomic(output_path, '\n'.join(lines))
 
 
 def main():